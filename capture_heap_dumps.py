@@ -6,9 +6,10 @@ This script creates realistic test scenarios for HPROF heap dump analysis.
 Features:
 - Auto-detects Java test files
 - Incremental compilation (only recompiles if source changed)
-- Compressed heap dumps (gzip format)
+- Compressed heap dumps (gzip format, using pigz if installed)
+- Heap dumps named by source hash, so dumps of unchanged sources are reused
 - Removes compiled .class files after tests
-- Caches metadata to detect source file changes
+- Caches metadata to detect source file changes (BLAKE3 if installed, else SHA-256)
 """
 
 import os
@@ -16,109 +17,272 @@ import sys
 import subprocess
 import time
 import signal
+import select
 import json
 import hashlib
 import gzip
+import mmap
 from pathlib import Path
 from datetime import datetime
 import shutil
+import struct
+import argparse
+import functools
+import re
+import zipfile
+import threading
+import asyncio
+
+try:
+    import blake3  # Optional: much faster than SHA-256 for change detection
+except ImportError:
+    blake3 = None
+
+# Hash algorithm used for source change detection; recorded in the metadata
+# and results files so entries produced with another algorithm are stale
+HASH_ALGO = "blake3" if blake3 is not None else "sha256"
+
+
+def scan_java_entries(directory):
+    """Return the os.DirEntry objects of a directory's .java files, sorted by name.
+
+    The entries carry cached stat results (non-recursive).
+    """
+    with os.scandir(directory) as entries:
+        return sorted((entry for entry in entries
+                       if entry.name.endswith('.java') and entry.is_file()),
+                      key=lambda entry: entry.name)
+
+
+def scan_java_files(directory):
+    """Return the sorted .java files of a directory (non-recursive)."""
+    return [Path(entry.path) for entry in scan_java_entries(directory)]
+
+
+def new_hasher():
+    """Create a hasher for HASH_ALGO."""
+    if blake3 is not None:
+        return blake3.blake3()
+    return hashlib.sha256()
+
+
+def hash_file(file_path):
+    """Compute the HASH_ALGO hash of a file's contents."""
+    hasher = new_hasher()
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size > 0:  # mmap rejects empty files
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    hasher.update(mm)
+            except (OSError, ValueError):
+                # Not mappable (e.g. special filesystems), read in large blocks
+                hasher = new_hasher()
+                f.seek(0)
+                for byte_block in iter(lambda: f.read(1 << 20), b""):
+                    hasher.update(byte_block)
+    return hasher.hexdigest()
+
+# Fixed timestamps for reproducible class jars (see package_classes)
+REPRODUCIBLE_ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+REPRODUCIBLE_MTIME = 315532800  # 1980-01-01T00:00:00Z
+
+# Heap dump file names: content-addressed and from the old {name}_{pid}_{timestamp} scheme
+CURRENT_DUMP_RE = re.compile(r'(?P<name>.+)_[0-9a-f]{16}(_inprocess)?\.hprof\.gz')
+LEGACY_DUMP_RE = re.compile(r'(?P<name>.+)_\d+_\d{8}_\d{6}(\.hprof(\.gz)?|_histogram\.txt)')
+# Leftovers of interrupted captures: uncompressed dumps and partial .part files
+PARTIAL_DUMP_RE = re.compile(r'(?P<name>.+)_[0-9a-f]{16}(_inprocess)?\.hprof(\.gz\.part)?')
+
+
+
+def histogram_path(dump):
+    """Path of the class histogram that belongs to a heap dump."""
+    dump = Path(dump)
+    return dump.with_name(dump.name.split('.hprof')[0] + '_histogram.txt')
+
+
+# Printed by every test program once its heap scenario is set up
+READY_MARKER = b"Press Ctrl+C to exit"
+
+# Printed by jcmd and jmap once a dump is complete; both exit with 0 even if
+# the JVM failed to write the dump (file exists, disk full, bad option, ...)
+HEAP_DUMP_CREATED = b"Heap dump file created"
+
 
 class JmapHeapDumpCapture:
-    def __init__(self, test_programs_dir, output_dir):
+    # Resolved tool paths (None if missing), looked up once by check_requirements
+    tool_paths = {}
+
+    def __init__(self, test_programs_dir, output_dir, with_histogram=False, in_process=False):
         self.test_programs_dir = Path(test_programs_dir)
         self.output_dir = Path(output_dir)
-        self.pids = {}  # Maps process names to PIDs
+        self.with_histogram = with_histogram
+        self.in_process = in_process  # Dump via DumpLauncher instead of jcmd/jmap
+        self.launcher_file = self.test_programs_dir / "launcher" / "DumpLauncher.java"
         self.processes = {}  # Maps process names to Process objects
+        self.stdout_buffers = {}  # Maps process names to stdout read while waiting
         self.metadata_file = self.test_programs_dir / ".heap_dump_metadata.json"
+        self.classes_dir = self.test_programs_dir / ".classes"  # javac output, removed after run
+        self.classes_jar = self.classes_dir / "classes.jar"  # Class path of the test programs
+        self.cds_dir = self.output_dir / ".cds"  # AppCDS archives, see jvm_options
+        # Dumps of earlier sources, kept out of the directory the Java tests scan
+        self.previous_dir = self.output_dir / ".previous"
+        self._jvm_options = None  # Shared JVM options, computed once per run
+        self._cds_training_option = None  # Creates the AppCDS archive on first use
+        self._hash_cache = {}  # Maps paths to (mtime_ns, size, hash) tuples
+        self._metadata = None  # Parsed .heap_dump_metadata.json, loaded lazily
+        self._results = None  # Parsed results.json, loaded lazily
+        self.jcmd_dump_options = None  # Extra GC.heap_dump options, probed once
 
         # Create output directory
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.test_programs_dir.mkdir(parents=True, exist_ok=True)
 
     def load_results(self):
-        """Load previous run results from results.json."""
+        """Load previous run results from results.json (parsed once per run)."""
+        if self._results is not None:
+            return self._results
+
+        self._results = {'tests': {}}
         results_file = self.output_dir / "results.json"
         if results_file.exists():
             try:
                 with open(results_file, 'r') as f:
-                    return json.load(f)
+                    results = json.load(f)
+                # Source hashes from another algorithm can never match
+                if results.get('hash_algo') == HASH_ALGO:
+                    self._results = results
             except Exception:
                 pass
-        return {'tests': {}}
+        return self._results
 
-    def needs_heap_dump(self, name, java_file):
-        """Check if a heap dump needs to be (re)generated for a test.
+    def dump_path(self, name, source_hash):
+        """Content-addressed path of the heap dump for a test's source hash.
 
-        Returns True if the source file has changed since the last capture
-        or if the previously captured dump file no longer exists.
+        In-process dumps also contain DumpLauncher and run the program on
+        another thread, so they are kept apart from attach-mode dumps.
         """
-        previous = self.load_results()
-        if name not in previous.get('tests', {}):
-            return True
-
-        prev_test = previous['tests'][name]
+        mode = "_inprocess" if self.in_process else ""
+        return self.output_dir / f"{name}_{source_hash[:16]}{mode}.hprof.gz"
 
-        # Must have succeeded previously
-        if prev_test.get('status') not in ('success',):
-            return True
-
-        # Source hash must match
-        current_hash = self.compute_file_hash(java_file)
-        if prev_test.get('source_hash') != current_hash:
-            return True
-
-        # Heap dump file must still exist on disk
-        prev_dump = prev_test.get('heap_dump')
-        if not prev_dump or not Path(prev_dump).exists():
-            return True
+    def needs_heap_dump(self, name, source_hash):
+        """Check if a heap dump needs to be (re)generated for a test.
 
-        return False
+        Dumps are named after the source hash, so a dump captured for the
+        same source (e.g. on another branch) is found again by name, with
+        at most two stats and without consulting results.json.
+        """
+        dump = self.dump_path(name, source_hash)
+        return not (dump.exists() or (self.previous_dir / dump.name).exists())
 
     def check_requirements(self):
         """Check if required tools are available."""
-        tools = ['javac', 'java', 'jmap']
-        missing = []
-        for tool in tools:
-            if shutil.which(tool) is None:
-                missing.append(tool)
+        # In-process dumps need no attach tool
+        tools = ['javac', 'java'] if self.in_process else ['javac', 'java', 'jmap']
+        if not JmapHeapDumpCapture.tool_paths:
+            # Optional: jcmd lets the JVM write compressed dumps itself (JDK 15+),
+            # pigz compresses in parallel, output stays readable by HprofIO
+            JmapHeapDumpCapture.tool_paths = {
+                tool: shutil.which(tool) for tool in ['javac', 'java', 'jmap', 'jcmd', 'pigz']
+            }
+
+        missing = [tool for tool in tools if self.tool_paths[tool] is None]
 
         if missing:
             print(f"Error: Missing required tools: {', '.join(missing)}")
             print("Please ensure Java Development Kit (JDK) is installed and in PATH")
             sys.exit(1)
 
-        print("✓ All required tools found: javac, java, jmap")
+        print(f"✓ All required tools found: {', '.join(tools)}")
+
+        if self.tool_paths['pigz']:
+            print("✓ Using pigz for heap dump compression")
+
+    def tool(self, name):
+        """Return the resolved path of a tool, or its bare name if unresolved."""
+        return self.tool_paths.get(name) or name
+
+    def probe_jcmd_dump_options(self, pid):
+        """Return the GC.heap_dump options for compressed dumps, or None.
+
+        Uses the help output of the first target JVM, as jcmd can only
+        describe the commands of a running JVM. The result is cached.
+        """
+        if self.jcmd_dump_options is not None:
+            return self.jcmd_dump_options or None
+
+        self.jcmd_dump_options = []
+        if self.tool_paths.get('jcmd'):
+            try:
+                result = subprocess.run(
+                    [self.tool('jcmd'), str(pid), 'help', 'GC.heap_dump'],
+                    capture_output=True,
+                    timeout=30
+                )
+                help_text = result.stdout.decode()
+                if result.returncode == 0 and '-gz' in help_text:
+                    self.jcmd_dump_options = ['-gz=1']
+                    if '-parallel' in help_text:
+                        self.jcmd_dump_options.append(f'-parallel={os.cpu_count() or 1}')
+                    print(f"✓ Using jcmd GC.heap_dump {' '.join(self.jcmd_dump_options)}")
+            except Exception:
+                pass
+        return self.jcmd_dump_options or None
 
     def compute_file_hash(self, file_path):
-        """Compute SHA256 hash of a file."""
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+        """Compute the HASH_ALGO hash of a file.
+
+        Hashes are cached by (mtime, size), so unchanged files are only
+        stat'ed instead of being read again.
+        """
+        file_path = Path(file_path)
+        self.load_metadata()  # Seeds the hash cache from the previous run
+
+        st = file_path.stat()
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._hash_cache.get(file_path)
+        if cached and cached[:2] == key:
+            return cached[2]
+
+        digest = hash_file(file_path)
+        self._hash_cache[file_path] = (*key, digest)
+        return digest
 
     def load_metadata(self):
-        """Load compilation metadata from cache."""
+        """Load compilation metadata from cache (parsed once per run)."""
+        if self._metadata is not None:
+            return self._metadata
+
+        self._metadata = {'files': {}, 'hash_algo': HASH_ALGO}
         if self.metadata_file.exists():
             try:
                 with open(self.metadata_file, 'r') as f:
-                    return json.load(f)
+                    metadata = json.load(f)
+                # Hashes from another algorithm can never match
+                if metadata.get('hash_algo') == HASH_ALGO:
+                    self._metadata = metadata
             except:
                 pass
-        return {'files': {}}
+
+        for path, (mtime_ns, size, digest) in self._metadata.get('hash_cache', {}).items():
+            self._hash_cache.setdefault(Path(path), (mtime_ns, size, digest))
+        return self._metadata
 
     def save_metadata(self, metadata):
-        """Save compilation metadata to cache."""
+        """Save compilation metadata and the file hash cache."""
+        metadata['hash_algo'] = HASH_ALGO
+        metadata['hash_cache'] = {
+            str(path): list(entry) for path, entry in self._hash_cache.items()
+        }
+        self._metadata = metadata
         with open(self.metadata_file, 'w') as f:
             json.dump(metadata, f, indent=2)
 
-    def needs_compilation(self, java_file):
+    def needs_compilation(self, java_file, metadata):
         """Check if a Java file needs recompilation."""
-        metadata = self.load_metadata()
         file_key = java_file.name
 
         class_name = self.get_java_class_name(java_file)
-        class_file = java_file.parent / f"{class_name}.class"
+        class_file = self.classes_dir / f"{class_name}.class"
         if not class_file.exists():
             return True
 
@@ -130,15 +294,26 @@ class JmapHeapDumpCapture:
         previous_hash = metadata['files'][file_key].get('hash')
         return current_hash != previous_hash
 
-    def compile_java_file(self, java_file):
-        """Compile a single Java file if it has changed."""
+    def record_compilation(self, java_file, metadata):
+        """Record a successful compilation in the (unsaved) metadata."""
+        metadata['files'][java_file.name] = {
+            'hash': self.compute_file_hash(java_file),
+            'timestamp': datetime.now().isoformat(),
+            'compiled': True
+        }
+
+    def compile_java_file(self, java_file, metadata):
+        """Compile a single Java file if it has changed.
+
+        Updates metadata in place; the caller saves it.
+        """
         java_file = Path(java_file)
         if not java_file.exists():
             print(f"Warning: File not found: {java_file}")
             return False
 
         # Check if recompilation is needed
-        if not self.needs_compilation(java_file):
+        if not self.needs_compilation(java_file, metadata):
             print(f"Skipping {java_file.name} (already compiled)", end=" ")
             print("✓")
             return True
@@ -146,7 +321,7 @@ class JmapHeapDumpCapture:
         try:
             print(f"Compiling {java_file.name}...", end=" ")
             result = subprocess.run(
-                ['javac', str(java_file)],
+                [self.tool('javac'), '-d', str(self.classes_dir), str(java_file)],
                 capture_output=True,
                 timeout=30
             )
@@ -155,15 +330,33 @@ class JmapHeapDumpCapture:
                 print(f"  Error: {result.stderr.decode()}")
                 return False
 
-            # Update metadata
-            metadata = self.load_metadata()
-            current_hash = self.compute_file_hash(java_file)
-            metadata['files'][java_file.name] = {
-                'hash': current_hash,
-                'timestamp': datetime.now().isoformat(),
-                'compiled': True
-            }
-            self.save_metadata(metadata)
+            self.record_compilation(java_file, metadata)
+
+            print("✓")
+            return True
+        except Exception as e:
+            print(f"FAILED - {e}")
+            return False
+
+    def compile_batch(self, java_files, metadata):
+        """Compile several Java files with a single javac invocation.
+
+        This pays the javac JVM startup only once instead of once per file.
+        Updates metadata in place; the caller saves it.
+        """
+        print(f"Compiling {len(java_files)} files...", end=" ")
+        try:
+            result = subprocess.run(
+                [self.tool('javac'), '-d', str(self.classes_dir), *map(str, java_files)],
+                capture_output=True,
+                timeout=30 + 5 * len(java_files)
+            )
+            if result.returncode != 0:
+                print("FAILED")
+                return False
+
+            for java_file in java_files:
+                self.record_compilation(java_file, metadata)
 
             print("✓")
             return True
@@ -174,16 +367,35 @@ class JmapHeapDumpCapture:
     def compile_all(self):
         """Compile all Java test files."""
         print("\n=== Compiling Java Test Programs ===")
-        java_files = sorted(self.test_programs_dir.glob("*.java"))
+        java_files = scan_java_files(self.test_programs_dir)
 
         if not java_files:
             print("No Java files found in test_programs directory")
             return False
 
-        success_count = 0
-        for java_file in java_files:
-            if self.compile_java_file(java_file):
-                success_count += 1
+        if self.in_process:
+            java_files.append(self.launcher_file)
+
+        # Load metadata once, update it in memory and save it once
+        metadata = self.load_metadata()
+        try:
+            changed = []
+            for java_file in java_files:
+                if self.needs_compilation(java_file, metadata):
+                    changed.append(java_file)
+                else:
+                    print(f"Skipping {java_file.name} (already compiled) ✓")
+
+            success_count = len(java_files) - len(changed)
+            if changed and self.compile_batch(changed, metadata):
+                success_count += len(changed)
+            elif changed:
+                # Compile file by file to identify the culprit(s)
+                for java_file in changed:
+                    if self.compile_java_file(java_file, metadata):
+                        success_count += 1
+        finally:
+            self.save_metadata(metadata)
 
         print(f"✓ Compiled {success_count}/{len(java_files)} files successfully")
         return success_count == len(java_files)
@@ -191,222 +403,466 @@ class JmapHeapDumpCapture:
     def cleanup_class_files(self):
         """Remove all compiled .class files."""
         print("\n=== Cleaning Up Compiled Classes ===")
-        class_files = list(self.test_programs_dir.glob("*.class"))
-        inner_classes = list(self.test_programs_dir.glob("*$*.class"))
-
-        total_files = len(class_files) + len(inner_classes)
-
-        if total_files == 0:
+        if not self.classes_dir.exists():
             print("No .class files to clean up")
             return
 
-        print(f"Removing {total_files} .class files...", end=" ")
-        try:
-            for class_file in class_files + inner_classes:
-                class_file.unlink()
-            print("✓")
-        except Exception as e:
-            print(f"Warning: {e}")
+        print(f"Removing {self.classes_dir}...", end=" ")
+        shutil.rmtree(self.classes_dir, ignore_errors=True)
+        print("✓")
 
     def get_java_class_name(self, java_file):
         """Extract the public class name from Java file."""
-        with open(java_file, 'r') as f:
-            for line in f:
-                if 'public class' in line:
-                    # Extract class name
-                    parts = line.split('public class')[1].strip().split('{')[0].strip()
-                    return parts
-        return java_file.stem
-
-    def run_program(self, java_file, name, max_wait_secs=10):
-        """Start a Java program and return its PID."""
+        java_file = Path(java_file)
+        return read_java_class_name(str(java_file), java_file.stat().st_mtime_ns)
+
+    def package_classes(self):
+        """Pack the compiled classes into a reproducible jar.
+
+        CDS cannot archive classes loaded from directories, and an archive
+        only stays valid while the jar's size and mtime are unchanged. Fixed
+        entry timestamps and a fixed jar mtime keep both stable across runs.
+        """
+        with zipfile.ZipFile(self.classes_jar, 'w', zipfile.ZIP_STORED) as jar:
+            for class_file in sorted(self.classes_dir.rglob("*.class")):
+                entry = zipfile.ZipInfo(class_file.relative_to(self.classes_dir).as_posix(),
+                                        REPRODUCIBLE_ZIP_DATE)
+                jar.writestr(entry, class_file.read_bytes())
+        os.utime(self.classes_jar, (REPRODUCIBLE_MTIME, REPRODUCIBLE_MTIME))
+
+    def jvm_options(self):
+        """Return the JVM options shared by all test programs.
+
+        Uses an AppCDS archive of the test classes, keyed by the class jar
+        and JDK, to cut JVM startup. If there is none yet, the first program
+        of the run creates it when it is terminated; -Xshare:auto silently
+        ignores archives that turn out to be unusable.
+        """
+        if self._jvm_options is not None:
+            return self._jvm_options
+
+        self.package_classes()
+        key = new_hasher()
+        key.update(hash_file(self.classes_jar).encode())
+        key.update(os.path.realpath(self.tool('java')).encode())
+        archive = self.cds_dir / f"app-{key.hexdigest()[:16]}.jsa"
+
+        self.cds_dir.mkdir(exist_ok=True)
+        for stale in self.cds_dir.glob("app-*.jsa"):
+            if stale != archive:
+                stale.unlink(missing_ok=True)
+
+        cds_options = []
+        if archive.exists():
+            cds_options.append(f'-XX:SharedArchiveFile={archive}')
+        else:
+            self._cds_training_option = f'-XX:ArchiveClassesAtExit={archive}'
+
+        self._jvm_options = [
+            '-cp', str(self.classes_jar),
+            '-Xshare:auto',
+            *cds_options,
+            # Small, predictable heaps start faster
+            '-XX:+UseSerialGC',
+            '-Xms64m',
+        ]
+        return self._jvm_options
+
+    def spawn_program(self, java_file, name, dump_file=None, max_wait_secs=10):
+        """Start a Java program without waiting for it; return the process.
+
+        With dump_file, the program runs under DumpLauncher, which writes
+        the heap dump from inside the JVM once the program is set up and
+        then exits.
+        """
         class_name = self.get_java_class_name(java_file)
+        main_args = [class_name]
+        if dump_file:
+            main_args = ['DumpLauncher', class_name, str(dump_file), str(max_wait_secs)]
 
         print(f"Starting {name} ({class_name})...", end=" ")
         try:
+            options = self.jvm_options()
+            if self._cds_training_option:
+                options = options + [self._cds_training_option]
+                self._cds_training_option = None
+
             # Run with additional JVM flags for better diagnostics
             process = subprocess.Popen(
                 [
-                    'java',
-                    '-cp', str(self.test_programs_dir),
+                    self.tool('java'),
+                    *options,
                     '-XX:+UnlockDiagnosticVMOptions',
                     '-XX:+DebugNonSafepoints',
-                    class_name
+                    *main_args
                 ],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                preexec_fn=os.setsid  # Create new process group
+                start_new_session=True  # Create new process group
             )
 
             self.processes[name] = process
-            self.pids[name] = process.pid
-
-            # Wait a bit for the program to start
-            time.sleep(max_wait_secs)
-
-            # Check if process is still running
-            if process.poll() is None:
-                print(f"✓ (PID: {process.pid})")
-                return process.pid
-            else:
-                print("FAILED - Process exited prematurely")
-                stdout, stderr = process.communicate()
-                print(f"  stdout: {stdout.decode()}")
-                print(f"  stderr: {stderr.decode()}")
-                return None
+            self.stdout_buffers[name] = b""
+            print(f"✓ (PID: {process.pid})")
+            return process
 
         except Exception as e:
             print(f"FAILED - {e}")
             return None
 
-    def capture_heap_dump(self, name, pid):
-        """Capture heap dump using jmap and compress it."""
+    def wait_for_startup(self, names, max_wait_secs=10, poll_interval=0.05):
+        """Wait until every named program printed READY_MARKER or exited.
+
+        Programs that never print the marker are waited for max_wait_secs.
+        """
+        pending = {name: self.processes[name] for name in names if name in self.processes}
+        for name, process in pending.items():
+            os.set_blocking(process.stdout.fileno(), False)
+            self.stdout_buffers.setdefault(name, b"")
+
+        deadline = time.monotonic() + max_wait_secs
+        while pending and time.monotonic() < deadline:
+            for name, process in list(pending.items()):
+                try:
+                    chunk = os.read(process.stdout.fileno(), 4096)
+                except BlockingIOError:
+                    chunk = b""
+                self.stdout_buffers[name] += chunk
+                if READY_MARKER in self.stdout_buffers[name] or process.poll() is not None:
+                    del pending[name]
+            if pending:
+                time.sleep(poll_interval)
+
+    def wait_ready(self, name):
+        """Check that a spawned program is still running and return its PID."""
+        process = self.processes.get(name)
+        if process is None:
+            return None
+
+        print(f"Checking {name} (PID: {process.pid})...", end=" ")
+        if process.poll() is None:
+            print("✓ running")
+            return process.pid
+
+        print("FAILED - Process exited prematurely")
+        stdout, stderr = process.communicate()
+        stdout = self.stdout_buffers.get(name, b"") + stdout
+        print(f"  stdout: {stdout.decode()}")
+        print(f"  stderr: {stderr.decode()}")
+        return None
+
+    async def capture_heap_dump(self, name, pid, source_hash):
+        """Capture a compressed heap dump using jcmd, or jmap on older JDKs.
+
+        Runs as a coroutine, so the dumps of several programs are captured
+        concurrently; each outcome is printed as a single line.
+        Returns the dump path, or None on failure.
+        """
         if pid is None:
             print(f"  Skipping dump for {name} - no valid PID")
             return None
 
-        # Use .hprof.gz for compressed heap dumps
-        dump_file_base = self.output_dir / f"{name}_{pid}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        dump_file = dump_file_base.with_suffix('.hprof')
-        dump_file_gz = dump_file_base.with_suffix('.hprof.gz')
+        # Write to a .part file first, so an interrupted capture never
+        # leaves a truncated dump under its content-addressed name
+        dump_file_gz = self.dump_path(name, source_hash)
+        dump_file = dump_file_gz.with_suffix('')  # Uncompressed .hprof
+        part_file = dump_file_gz.with_name(dump_file_gz.name + '.part')
+        # The JVM refuses to overwrite files, and a stale .part file from an
+        # interrupted run would otherwise be stored as this dump
+        dump_file.unlink(missing_ok=True)
+        part_file.unlink(missing_ok=True)
 
-        print(f"Capturing heap dump for {name} (PID: {pid})...", end=" ")
+        jcmd_options = self.probe_jcmd_dump_options(pid)
+
+        print(f"Capturing heap dump for {name} (PID: {pid})...")
+        process = None
         try:
+            if jcmd_options:
+                # The JVM writes the compressed dump directly
+                process = await asyncio.create_subprocess_exec(
+                    self.tool('jcmd'), str(pid), 'GC.heap_dump', *jcmd_options, str(part_file),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=60)
+                if HEAP_DUMP_CREATED in stdout and part_file.exists():
+                    compressed_size = part_file.stat().st_size
+                    os.replace(part_file, dump_file_gz)
+                    print(f"✓ {name}: {compressed_size / (1024*1024):.2f} MB, compressed by the JVM")
+                    return str(dump_file_gz)
+                print(f"✗ {name}: heap dump FAILED")
+                if stdout or stderr:
+                    print(f"  Error: {(stdout + stderr).decode()}")
+                return None
+
             # Capture to temporary uncompressed file
-            result = subprocess.run(
-                ['jmap', '-dump:live,format=b,file=' + str(dump_file), str(pid)],
-                capture_output=True,
-                timeout=60
+            process = await asyncio.create_subprocess_exec(
+                self.tool('jmap'), '-dump:live,format=b,file=' + str(dump_file), str(pid),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
             )
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=60)
 
-            if result.returncode == 0 and dump_file.exists():
-                # Compress the heap dump
-                uncompressed_size = dump_file.stat().st_size
-                with open(dump_file, 'rb') as f_in:
-                    with gzip.open(dump_file_gz, 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-
-                # Remove uncompressed version
-                dump_file.unlink()
-
-                compressed_size = dump_file_gz.stat().st_size
-                ratio = (1 - compressed_size / uncompressed_size) * 100 if uncompressed_size > 0 else 0
-                print(f"✓ ({compressed_size / (1024*1024):.2f} MB, compressed {ratio:.1f}%)")
-                return str(dump_file_gz)
+            if HEAP_DUMP_CREATED in stdout and dump_file.exists():
+                dump, details = await asyncio.to_thread(
+                    self.compress_and_store, dump_file, part_file, dump_file_gz)
+                print(f"✓ {name}: {details}")
+                return dump
             else:
-                print("FAILED")
-                if result.stderr:
-                    print(f"  Error: {result.stderr.decode()}")
+                print(f"✗ {name}: heap dump FAILED")
+                if stdout or stderr:
+                    print(f"  Error: {(stdout + stderr).decode()}")
                 return None
 
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            print(f"✗ {name}: heap dump FAILED - timed out")
+            return None
         except Exception as e:
-            print(f"FAILED - {e}")
+            print(f"✗ {name}: heap dump FAILED - {e}")
             return None
 
-    def capture_heap_histogram(self, name, pid):
-        """Capture heap histogram using jmap."""
-        if pid is None:
-            return None
+    async def capture_heap_dumps(self, test_results):
+        """Capture the heap dumps of all running test programs concurrently."""
+        return await asyncio.gather(*(
+            self.capture_heap_dump(test_result['name'], test_result['pid'], test_result['source_hash'])
+            for test_result in test_results
+        ))
 
-        hist_file = self.output_dir / f"{name}_{pid}_histogram.txt"
+    def compress_and_store(self, dump_file, part_file, dump_file_gz):
+        """Compress an uncompressed dump and store it.
 
-        print(f"Capturing heap histogram for {name} (PID: {pid})...", end=" ")
-        try:
-            result = subprocess.run(
-                ['jmap', '-histo', str(pid)],
-                capture_output=True,
-                timeout=30
-            )
-
-            if result.returncode == 0:
-                with open(hist_file, 'w') as f:
-                    f.write(result.stdout.decode())
-                print("✓")
-                return str(hist_file)
-            else:
-                print("FAILED")
-                return None
+        Returns (dump path, size details for printing).
+        """
+        uncompressed_size = dump_file.stat().st_size
+        self.compress_dump(dump_file, part_file)
+        compressed_size = part_file.stat().st_size
+        os.replace(part_file, dump_file_gz)
+
+        ratio = (1 - compressed_size / uncompressed_size) * 100 if uncompressed_size > 0 else 0
+        details = f"{compressed_size / (1024*1024):.2f} MB, compressed {ratio:.1f}%"
+        return str(dump_file_gz), details
+
+    def compress_dump(self, dump_file, dump_file_gz):
+        """Gzip a heap dump in a single streaming pass and remove the original.
+
+        jmap opens its target with O_EXCL, so it cannot write into a pipe and
+        the uncompressed file has to hit the disk once. Level 1 keeps the
+        compression I/O-bound instead of CPU-bound; pigz spreads it over all
+        cores when installed.
+        """
+        if self.tool_paths.get('pigz'):
+            with open(dump_file_gz, 'wb') as f_out:
+                subprocess.run(
+                    [self.tool('pigz'), '-1', '-c', str(dump_file)],
+                    stdout=f_out,
+                    check=True
+                )
+        else:
+            with open(dump_file, 'rb') as f_in:
+                with gzip.open(dump_file_gz, 'wb', compresslevel=1) as f_out:
+                    shutil.copyfileobj(f_in, f_out, 1 << 20)
+
+        # Remove uncompressed version
+        dump_file.unlink()
+
+    def save_histogram(self, dump):
+        """Derive a class histogram from a captured heap dump.
+
+        This replaces a separate 'jmap -histo' run, which would pause the
+        target JVM for a second full heap walk.
+        """
+        dump = Path(dump)
+        hist_file = histogram_path(dump)
 
+        print(f"Generating heap histogram from {dump.name}...", end=" ")
+        try:
+            histogram = generate_histogram(dump)
+            with open(hist_file, 'w') as f:
+                f.write(histogram)
+            print("✓")
+            return str(hist_file)
         except Exception as e:
             print(f"FAILED - {e}")
             return None
 
-    def cleanup_previous_outputs(self, name):
-        """Remove previous heap dumps and histograms for a test name."""
-        patterns = [
-            f"{name}_*.hprof",
-            f"{name}_*.hprof.gz",
-            f"{name}_*_histogram.txt",
-        ]
+    def sweep_dump_cache(self, current_dumps, keep=2):
+        """Keep only the current dump of each test in the output directory.
 
+        current_dumps maps test names to the dump of their current source
+        (None if there is none). Other dumps of these tests move to
+        .previous, where the Java tests do not look for dumps and which
+        keeps the `keep` most recently used dumps per test for later reuse.
+        Also removes dumps in the old `{name}_{pid}_{timestamp}` naming
+        scheme and leftovers of interrupted captures.
+        """
+        current = {name: Path(dump).name if dump else None for name, dump in current_dumps.items()}
+        moved = 0
         removed = 0
-        for pattern in patterns:
-            for file_path in self.output_dir.glob(pattern):
-                try:
-                    file_path.unlink()
-                    removed += 1
-                except Exception:
-                    pass
-
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                if match := CURRENT_DUMP_RE.fullmatch(entry.name):
+                    name = match.group('name')
+                    if name in current and entry.name != current[name]:
+                        self.previous_dir.mkdir(exist_ok=True)
+                        dump = Path(entry.path)
+                        os.replace(dump, self.previous_dir / dump.name)
+                        if histogram_path(dump).exists():
+                            os.replace(histogram_path(dump), histogram_path(self.previous_dir / dump.name))
+                        moved += 1
+                elif match := (LEGACY_DUMP_RE.fullmatch(entry.name)
+                               or PARTIAL_DUMP_RE.fullmatch(entry.name)):
+                    if match.group('name') in current:
+                        os.unlink(entry.path)
+                        removed += 1
+
+        dumps = {}  # Test name -> [(mtime, path)]
+        if self.previous_dir.exists():
+            with os.scandir(self.previous_dir) as entries:
+                for entry in entries:
+                    if match := CURRENT_DUMP_RE.fullmatch(entry.name):
+                        if match.group('name') in current:
+                            dumps.setdefault(match.group('name'), []).append(
+                                (entry.stat().st_mtime, Path(entry.path)))
+
+        # Reused dumps get their mtime bumped, so mtime orders by last use
+        for test_dumps in dumps.values():
+            test_dumps.sort(reverse=True)
+            for _, dump in test_dumps[keep:]:
+                dump.unlink(missing_ok=True)
+                histogram_path(dump).unlink(missing_ok=True)
+                removed += 1
+
+        # Shared dump storage of earlier versions
+        shutil.rmtree(self.output_dir / ".objects", ignore_errors=True)
+
+        if moved > 0:
+            print(f"Moved {moved} outdated dump(s) to {self.previous_dir.name} ✓")
         if removed > 0:
-            print(f"Removed {removed} previous dump file(s) for {name} ✓")
-
-    def terminate_process(self, name):
-        """Terminate a running process."""
-        if name not in self.pids:
-            return
+            print(f"Removed {removed} stale dump file(s) ✓")
 
-        pid = self.pids[name]
-        process = self.processes.get(name)
-
-        print(f"Terminating {name} (PID: {pid})...", end=" ")
+    def signal_process_group(self, process, sig):
+        """Send a signal to a program and its children."""
         try:
-            if process:
-                # Use process group to terminate the entire process and its children
-                os.killpg(os.getpgid(pid), signal.SIGTERM)
-                process.wait(timeout=5)
-            print("✓")
-        except subprocess.TimeoutExpired:
-            print("(forced kill)", end=" ")
-            try:
-                os.killpg(os.getpgid(pid), signal.SIGKILL)
-                process.wait(timeout=2)
-            except:
-                pass
-            print("✓")
-        except Exception as e:
-            print(f"Warning: {e}")
-
-    def terminate_all(self):
-        """Terminate all running processes."""
+            # Each program leads its own session, so its process group ID is
+            # its PID; the PID stays reserved until the process is reaped
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def wait_for_exit(self, processes, timeout):
+        """Wait up to timeout seconds for all processes, return the survivors."""
+        deadline = time.monotonic() + timeout
+        pidfds = {}
+        try:
+            if hasattr(os, 'pidfd_open'):  # Linux 5.3+
+                for name, process in processes.items():
+                    pidfds[os.pidfd_open(process.pid)] = name
+        except OSError:
+            for fd in pidfds:
+                os.close(fd)
+            pidfds = {}
+
+        if pidfds:
+            # A pidfd becomes readable once its process exits
+            waiting = set(pidfds)
+            while waiting and (remaining := deadline - time.monotonic()) > 0:
+                readable, _, _ = select.select(list(waiting), [], [], remaining)
+                waiting.difference_update(readable)
+            for fd in pidfds:
+                os.close(fd)
+        else:
+            while (any(process.poll() is None for process in processes.values())
+                   and time.monotonic() < deadline):
+                time.sleep(0.05)
+
+        return {name: process for name, process in processes.items()
+                if process.poll() is None}
+
+    def terminate_all(self, timeout=5):
+        """Terminate all running processes.
+
+        All programs are signalled first and then waited for together, so
+        shutdown takes at most timeout seconds in total.
+        """
         print("\n=== Terminating Processes ===")
-        for name in list(self.processes.keys()):
-            self.terminate_process(name)
+        running = {name: process for name, process in self.processes.items()
+                   if process.poll() is None}
+        for name, process in running.items():
+            print(f"Terminating {name} (PID: {process.pid})...")
+            self.signal_process_group(process, signal.SIGTERM)
+
+        survivors = self.wait_for_exit(running, timeout)
+        for name, process in survivors.items():
+            print(f"Force killing {name} (PID: {process.pid})...")
+            self.signal_process_group(process, signal.SIGKILL)
+        self.wait_for_exit(survivors, 2)
+
+        if running:
+            print(f"✓ Terminated {len(running)} process(es)")
+        self.processes.clear()
+
+    def reuse_heap_dump(self, name, java_file, source_hash):
+        """Build the result of a test whose heap dump is already cached."""
+        dump = self.dump_path(name, source_hash)
+        previous = self.previous_dir / dump.name
+        if not dump.exists():
+            # Bring a dump of an earlier run of this source back into view
+            os.replace(previous, dump)
+            if histogram_path(previous).exists():
+                os.replace(histogram_path(previous), histogram_path(dump))
+        os.utime(dump)  # Mark as recently used for sweep_dump_cache
+
+        # results.json is only parsed (once) if a dump is actually reused
+        prev_test = self.load_results().get('tests', {}).get(name)
+        if prev_test and prev_test.get('heap_dump') == str(dump):
+            test_result = prev_test
+        else:
+            # Dump from an earlier run of the same source (e.g. another branch)
+            test_result = {
+                'name': name,
+                'file': str(java_file),
+                'source_hash': source_hash,
+                'pid': None,
+                'heap_dump': str(dump),
+                'histogram': None,
+                'status': 'success'
+            }
+
+        if self.with_histogram and not test_result.get('histogram'):
+            hist_file = histogram_path(dump)
+            test_result['histogram'] = str(hist_file) if hist_file.exists() else self.save_histogram(dump)
+        return test_result
 
-    def run_tests(self, test_configs):
-        """Run all test configurations."""
+    def run_tests(self, test_configs, max_wait_secs=10):
+        """Run all test configurations.
+
+        All programs are started first and waited for together until they
+        report that their setup is done, then their heap dumps are captured
+        concurrently.
+        """
         print("\n=== Running Test Programs ===")
-        previous = self.load_results()
         results = {
             'timestamp': datetime.now().isoformat(),
+            'hash_algo': HASH_ALGO,
             'tests': {}
         }
 
+        started = []
         for config in test_configs:
             name = config['name']
             java_file = config['file']
             print(f"\n--- Test: {name} ---")
 
-            # Skip if source hasn't changed and heap dump still exists
-            if not self.needs_heap_dump(name, java_file):
-                print(f"Skipping {name} (source unchanged, heap dump exists) ✓")
-                results['tests'][name] = previous['tests'][name]
-                continue
-
-            self.cleanup_previous_outputs(name)
-
             source_hash = self.compute_file_hash(java_file)
 
+            # Skip if a heap dump for this exact source already exists
+            if not self.needs_heap_dump(name, source_hash):
+                print(f"Skipping {name} (heap dump for this source exists) ✓")
+                results['tests'][name] = self.reuse_heap_dump(name, java_file, source_hash)
+                continue
+
             test_result = {
                 'name': name,
                 'file': str(java_file),
@@ -416,27 +872,94 @@ class JmapHeapDumpCapture:
                 'histogram': None,
                 'status': 'failed'
             }
+            results['tests'][name] = test_result
 
             # Start the program
-            pid = self.run_program(java_file, name)
+            if self.in_process:
+                dump_file = self.dump_path(name, source_hash).with_suffix('')
+                dump_file.unlink(missing_ok=True)  # dumpHeap refuses to overwrite files
+                process = self.spawn_program(java_file, name, dump_file, max_wait_secs)
+            else:
+                process = self.spawn_program(java_file, name)
+            if process:
+                started.append(test_result)
+
+        if not started:
+            return results
+
+        if self.in_process:
+            self.collect_in_process_dumps(started, max_wait_secs)
+            return results
+
+        # Wait for the programs to finish their setup
+        print(f"\nWaiting up to {max_wait_secs}s for {len(started)} program(s) to start...")
+        self.wait_for_startup([test_result['name'] for test_result in started], max_wait_secs)
+
+        running = []
+        for test_result in started:
+            pid = self.wait_ready(test_result['name'])
             if pid:
                 test_result['pid'] = pid
+                running.append(test_result)
 
-                # Capture heap dump
-                dump = self.capture_heap_dump(name, pid)
-                if dump:
-                    test_result['heap_dump'] = dump
+        if running:
+            # Probe once before the captures start, they all share the result
+            self.probe_jcmd_dump_options(running[0]['pid'])
 
-                # Capture histogram
-                hist = self.capture_heap_histogram(name, pid)
-                if hist:
-                    test_result['histogram'] = hist
+            print(f"\n=== Capturing {len(running)} Heap Dump(s) ===")
+            captures = asyncio.run(self.capture_heap_dumps(running))
+            for test_result, dump in zip(running, captures):
+                self.record_dump(test_result, dump)
+
+        return results
 
-                test_result['status'] = 'success' if dump else 'partial'
+    def collect_in_process_dumps(self, started, max_wait_secs):
+        """Wait for DumpLauncher programs to exit and store their dumps."""
+        print(f"\nWaiting for {len(started)} in-process heap dump(s)...")
+        processes = {test_result['name']: self.processes[test_result['name']]
+                     for test_result in started}
+        self.wait_for_exit(processes, max_wait_secs + 60)
+
+        for test_result in started:
+            name = test_result['name']
+            process = processes[name]
+            print(f"\n--- Capture: {name} ---")
+            dump_file_gz = self.dump_path(name, test_result['source_hash'])
+            dump_file = dump_file_gz.with_suffix('')
+            part_file = dump_file_gz.with_name(dump_file_gz.name + '.part')
+
+            print(f"Storing in-process heap dump for {name} (PID: {process.pid})...", end=" ")
+            if process.poll() != 0 or not dump_file.exists():
+                if process.poll() is None:
+                    print("FAILED - Timed out")
+                else:
+                    print("FAILED")
+                    _, stderr = process.communicate()
+                    print(f"  stderr: {stderr.decode()}")
+                dump_file.unlink(missing_ok=True)
+                continue
 
-            results['tests'][name] = test_result
+            test_result['pid'] = process.pid
+            try:
+                dump, details = self.compress_and_store(dump_file, part_file, dump_file_gz)
+                print(f"✓ ({details})")
+            except Exception as e:
+                print(f"FAILED - {e}")
+                dump = None
+            self.record_dump(test_result, dump)
+
+    def record_dump(self, test_result, dump):
+        """Record a captured dump (or its absence) for a running test."""
+        if dump:
+            test_result['heap_dump'] = dump
+
+            # Derive histogram offline from the dump
+            if self.with_histogram:
+                hist = self.save_histogram(dump)
+                if hist:
+                    test_result['histogram'] = hist
 
-        return results
+        test_result['status'] = 'success' if dump else 'partial'
 
     def print_summary(self, results):
         """Print summary of test results."""
@@ -476,10 +999,12 @@ class JmapHeapDumpCapture:
         results_file = self.output_dir / "results.json"
         with open(results_file, 'w') as f:
             json.dump(results, f, indent=2)
+        self._results = results
         print(f"\nDetailed results saved to: {results_file}")
 
     def run(self, test_configs):
         """Main execution flow."""
+        self._jvm_options = None  # The class jar is rebuilt for every run
         try:
             self.check_requirements()
 
@@ -488,6 +1013,8 @@ class JmapHeapDumpCapture:
                 return False
 
             results = self.run_tests(test_configs)
+            self.sweep_dump_cache({name: test_result['heap_dump']
+                                   for name, test_result in results['tests'].items()})
 
             return results
 
@@ -495,6 +1022,249 @@ class JmapHeapDumpCapture:
             self.terminate_all()
             self.cleanup_class_files()
 
+    def watch(self, debounce_secs=0.5):
+        """Re-run the tests of changed Java files until interrupted.
+
+        Uses kernel change notifications (inotify, FSEvents, ...) via the
+        optional watchdog package, so idle time costs no directory scans.
+        """
+        try:
+            from watchdog.events import (
+                EVENT_TYPE_CREATED, EVENT_TYPE_DELETED, EVENT_TYPE_MODIFIED, EVENT_TYPE_MOVED,
+                FileSystemEventHandler,
+            )
+            from watchdog.observers import Observer
+        except ImportError:
+            print("Error: --watch requires the watchdog package (pip install watchdog)")
+            return False
+
+        dirty = set()  # Names of changed Java files
+        lock = threading.Lock()
+        changed = threading.Event()
+        test_programs_dir = self.test_programs_dir.resolve()
+
+        # Only changes count: watchdog also reports opening and closing files,
+        # which every run (javac, hashing, class name lookup) does for all sources
+        change_types = {EVENT_TYPE_CREATED, EVENT_TYPE_DELETED, EVENT_TYPE_MODIFIED, EVENT_TYPE_MOVED}
+
+        class JavaFileHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type not in change_types or event.is_directory:
+                    return
+                for path in (event.src_path, getattr(event, 'dest_path', '')):
+                    path = Path(os.fsdecode(path)) if path else None
+                    if path and path.suffix == '.java' and path.parent.resolve() == test_programs_dir:
+                        with lock:
+                            dirty.add(path.name)
+                        changed.set()
+
+        observer = Observer()
+        observer.schedule(JavaFileHandler(), str(test_programs_dir), recursive=False)
+        observer.start()
+        print(f"\nWatching {test_programs_dir} for changes (Ctrl+C to stop)...")
+        try:
+            while True:
+                # Wait in short steps, Ctrl+C is only handled between them
+                if not changed.wait(timeout=1):
+                    continue
+                time.sleep(debounce_secs)  # Let editors finish writing
+                with lock:
+                    names = set(dirty)
+                    dirty.clear()
+                    changed.clear()
+
+                test_configs = [config for config in auto_generate_test_configs(self.test_programs_dir)
+                                if config['file'].name in names]
+                if not test_configs:
+                    continue
+
+                print(f"\nChanged: {', '.join(sorted(names))}")
+                previous = self.load_results()
+                results = self.run(test_configs)
+                if results:
+                    results['tests'] = {**previous.get('tests', {}), **results['tests']}
+                    self.print_summary(results)
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+        finally:
+            observer.stop()
+            observer.join()
+        return True
+
+
+# HPROF record and heap dump sub-record tags (see HprofConstants.java)
+HPROF_UTF8 = 0x01
+HPROF_LOAD_CLASS = 0x02
+HPROF_HEAP_DUMP = 0x0C
+HPROF_HEAP_DUMP_SEGMENT = 0x1C
+HPROF_GC_CLASS_DUMP = 0x20
+HPROF_GC_INSTANCE_DUMP = 0x21
+HPROF_GC_OBJ_ARRAY_DUMP = 0x22
+HPROF_GC_PRIM_ARRAY_DUMP = 0x23
+
+# Heap dump sub-record tag -> (number of IDs, number of u4s) for GC roots
+HPROF_GC_ROOTS = {
+    0xFF: (1, 0),  # ROOT_UNKNOWN
+    0x01: (2, 0),  # ROOT_JNI_GLOBAL
+    0x02: (1, 2),  # ROOT_JNI_LOCAL
+    0x03: (1, 2),  # ROOT_JAVA_FRAME
+    0x04: (1, 1),  # ROOT_NATIVE_STACK
+    0x05: (1, 0),  # ROOT_STICKY_CLASS
+    0x06: (1, 1),  # ROOT_THREAD_BLOCK
+    0x07: (1, 0),  # ROOT_MONITOR_USED
+    0x08: (1, 2),  # ROOT_THREAD_OBJ
+}
+
+# Basic type -> (size in bytes, array class name); objects use the ID size
+HPROF_BASIC_TYPES = {
+    0x04: (1, '[Z'),  # boolean
+    0x05: (2, '[C'),  # char
+    0x06: (4, '[F'),  # float
+    0x07: (8, '[D'),  # double
+    0x08: (1, '[B'),  # byte
+    0x09: (2, '[S'),  # short
+    0x0A: (4, '[I'),  # int
+    0x0B: (8, '[J'),  # long
+}
+HPROF_TYPE_OBJECT = 0x02
+
+
+def generate_histogram(hprof_path):
+    """Build a 'jmap -histo'-style class histogram from a (gzipped) HPROF file.
+
+    Byte counts are the instance field and array element data recorded in
+    the dump; object headers and padding are not part of the format.
+    """
+    opener = gzip.open if str(hprof_path).endswith('.gz') else open
+    names = {}  # UTF8 string ID -> string
+    class_names = {}  # class object ID -> class name
+    counts = {}  # class name or class ID -> [instances, bytes]
+
+    def count(key, size):
+        entry = counts.setdefault(key, [0, 0])
+        entry[0] += 1
+        entry[1] += size
+
+    with opener(hprof_path, 'rb') as f:
+        header = b''
+        while not header.endswith(b'\0'):
+            byte = f.read(1)
+            if not byte:
+                raise ValueError("Truncated HPROF header")
+            header += byte
+            if len(header) > 32 or not b'JAVA PROFILE'.startswith(header[:12]):
+                raise ValueError("Not an HPROF file")
+        id_and_timestamp = f.read(12)  # u4 ID size, u8 timestamp
+        if len(id_and_timestamp) < 12:
+            raise ValueError("Truncated HPROF header")
+        id_size = struct.unpack_from('>I', id_and_timestamp)[0]
+
+        while record_header := f.read(9):
+            tag, _, length = struct.unpack('>BII', record_header)
+            body = f.read(length)
+            if tag == HPROF_UTF8:
+                names[body[:id_size]] = body[id_size:].decode('utf-8', 'replace')
+            elif tag == HPROF_LOAD_CLASS:
+                class_id = body[4:4 + id_size]
+                name_id = body[8 + id_size:8 + 2 * id_size]
+                class_names[class_id] = names.get(name_id, '<unknown>').replace('/', '.')
+            elif tag in (HPROF_HEAP_DUMP, HPROF_HEAP_DUMP_SEGMENT):
+                _count_heap_dump_records(body, id_size, count)
+
+    histogram = {}
+    for key, (instances, size) in counts.items():
+        name = class_names.get(key, '<unknown>') if isinstance(key, bytes) else key
+        entry = histogram.setdefault(name, [0, 0])
+        entry[0] += instances
+        entry[1] += size
+
+    lines = [" num     #instances         #bytes  class name", "-" * 60]
+    rows = sorted(histogram.items(), key=lambda item: (-item[1][1], item[0]))
+    for num, (name, (instances, size)) in enumerate(rows, 1):
+        lines.append(f"{num:4}: {instances:14} {size:14}  {name}")
+    total_instances = sum(instances for instances, _ in histogram.values())
+    total_size = sum(size for _, size in histogram.values())
+    lines.append(f"Total {total_instances:14} {total_size:14}")
+    return "\n".join(lines) + "\n"
+
+
+def _count_heap_dump_records(body, id_size, count):
+    """Count the instances and arrays of a HEAP_DUMP(_SEGMENT) record body."""
+    u4 = struct.Struct('>I')
+    pos = 0
+    end = len(body)
+    while pos < end:
+        tag = body[pos]
+        pos += 1
+        if tag in HPROF_GC_ROOTS:
+            ids, u4s = HPROF_GC_ROOTS[tag]
+            pos += ids * id_size + u4s * 4
+        elif tag == HPROF_GC_INSTANCE_DUMP:
+            pos += id_size + 4
+            class_id = body[pos:pos + id_size]
+            size = u4.unpack_from(body, pos + id_size)[0]
+            pos += id_size + 4 + size
+            count(class_id, size)
+        elif tag == HPROF_GC_OBJ_ARRAY_DUMP:
+            pos += id_size + 4
+            length = u4.unpack_from(body, pos)[0]
+            class_id = body[pos + 4:pos + 4 + id_size]
+            pos += 4 + id_size + length * id_size
+            count(class_id, length * id_size)
+        elif tag == HPROF_GC_PRIM_ARRAY_DUMP:
+            pos += id_size + 4
+            length = u4.unpack_from(body, pos)[0]
+            elem_size, name = HPROF_BASIC_TYPES[body[pos + 4]]
+            pos += 5 + length * elem_size
+            count(name, length * elem_size)
+        elif tag == HPROF_GC_CLASS_DUMP:
+            pos += 7 * id_size + 4 + 4  # IDs, stack trace serial, instance size
+            constant_count = struct.unpack_from('>H', body, pos)[0]
+            pos += 2
+            for _ in range(constant_count):  # u2 index, u1 type, value
+                value_type = body[pos + 2]
+                pos += 3 + _value_size(value_type, id_size)
+            static_count = struct.unpack_from('>H', body, pos)[0]
+            pos += 2
+            for _ in range(static_count):  # name ID, u1 type, value
+                value_type = body[pos + id_size]
+                pos += id_size + 1 + _value_size(value_type, id_size)
+            field_count = struct.unpack_from('>H', body, pos)[0]
+            pos += 2 + field_count * (id_size + 1)  # name ID, u1 type
+        else:
+            raise ValueError(f"Unknown heap dump sub-record tag 0x{tag:02X}")
+
+
+def _value_size(value_type, id_size):
+    """Size of a value of the given HPROF basic type."""
+    if value_type == HPROF_TYPE_OBJECT:
+        return id_size
+    return HPROF_BASIC_TYPES[value_type][0]
+
+
+_CLASS_RE = re.compile(rb'public\s+class\s+(\w+)')
+
+
+@functools.lru_cache(maxsize=None)
+def read_java_class_name(path_str, mtime_ns):
+    """Extract the public class name from a Java file.
+
+    Cached per (path, mtime), so each source is scanned at most once per change.
+    """
+    with open(path_str, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > 0:  # mmap rejects empty files
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    match = _CLASS_RE.search(mm)
+                    class_name = match and match.group(1)
+            except (OSError, ValueError):
+                # Not mappable (e.g. special filesystems), see hash_file
+                match = _CLASS_RE.search(f.read())
+                class_name = match and match.group(1)
+            if class_name:
+                return class_name.decode()
+    return Path(path_str).stem
+
 
 def extract_description_from_java_file(java_file):
     """Extract description from Java file javadoc or comment."""
@@ -526,17 +1296,53 @@ def extract_description_from_java_file(java_file):
     return None
 
 
+def _load_or_build_configs(test_programs_dir):
+    """Return {file name: description} for all Java files, using a stat cache.
+
+    .test_configs_cache.json maps file names to (mtime_ns, size, description),
+    so only files whose stat changed are opened and scanned.
+    """
+    cache_file = test_programs_dir / ".test_configs_cache.json"
+    cache = {}
+    if cache_file.exists():
+        try:
+            with open(cache_file, 'r') as f:
+                cache = json.load(f)
+        except Exception:
+            pass
+
+    descriptions = {}
+    updated = {}
+    for entry in scan_java_entries(test_programs_dir):
+        java_file = Path(entry.path)
+        st = entry.stat()
+        cached = cache.get(java_file.name)
+        if cached and cached[:2] == [st.st_mtime_ns, st.st_size]:
+            description = cached[2]
+        else:
+            description = extract_description_from_java_file(java_file)
+        descriptions[java_file.name] = description
+        updated[java_file.name] = [st.st_mtime_ns, st.st_size, description]
+
+    if updated != cache:
+        try:
+            with open(cache_file, 'w') as f:
+                json.dump(updated, f, indent=2)
+        except OSError:
+            pass
+    return descriptions
+
+
 def auto_generate_test_configs(test_programs_dir):
     """Automatically generate test configurations from Java files."""
     test_configs = []
-    java_files = sorted(test_programs_dir.glob("*.java"))
 
-    for java_file in java_files:
+    for file_name, description in _load_or_build_configs(test_programs_dir).items():
+        java_file = test_programs_dir / file_name
+
         # Extract class name (filename without .java)
         name = java_file.stem
 
-        # Extract description from file
-        description = extract_description_from_java_file(java_file)
         if not description:
             description = f"Test case: {name}"
 
@@ -549,7 +1355,34 @@ def auto_generate_test_configs(test_programs_dir):
     return test_configs
 
 
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Compile Java test programs and capture their heap dumps."
+    )
+    parser.add_argument(
+        '--with-histogram',
+        action='store_true',
+        help="also write a class histogram for each dump (derived offline from the dump)"
+    )
+    parser.add_argument(
+        '--in-process',
+        action='store_true',
+        help="dump the heap from inside each test JVM (via DumpLauncher) "
+             "instead of attaching jcmd/jmap"
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help="keep running and re-capture dumps whenever a test program changes "
+             "(requires the watchdog package)"
+    )
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
+
     # Get script directory
     script_dir = Path(__file__).parent.absolute()
     test_programs_dir = script_dir / "test_programs"
@@ -568,13 +1401,17 @@ def main():
     print()
 
     # Create and run the capture utility
-    capture = JmapHeapDumpCapture(test_programs_dir, output_dir)
+    capture = JmapHeapDumpCapture(test_programs_dir, output_dir,
+                                  with_histogram=args.with_histogram,
+                                  in_process=args.in_process)
     results = capture.run(test_configs)
 
     # Print summary
     if results:
         capture.print_summary(results)
         print(f"\nHeap dumps are available in: {output_dir}")
+        if args.watch and not capture.watch():
+            return 1
         return 0
     else:
         print("Error running tests")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Tests for the offline heap histogram of capture_heap_dumps.py.
+
+Run with: python3 -m unittest test_capture_heap_dumps
+"""
+
+import gzip
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+from capture_heap_dumps import (
+    HPROF_GC_CLASS_DUMP,
+    HPROF_GC_INSTANCE_DUMP,
+    HPROF_GC_OBJ_ARRAY_DUMP,
+    HPROF_GC_PRIM_ARRAY_DUMP,
+    HPROF_HEAP_DUMP_SEGMENT,
+    HPROF_LOAD_CLASS,
+    HPROF_TYPE_OBJECT,
+    HPROF_UTF8,
+    generate_histogram,
+)
+
+FOO_CLASS_ID = 0x100
+OBJECT_ARRAY_CLASS_ID = 0x200
+HPROF_TYPE_INT = 0x0A
+HPROF_ROOT_STICKY_CLASS = 0x05
+
+
+def build_hprof(id_size):
+    """Build an HPROF file with two Foo instances, an Object[3] and an int[2]."""
+    def id_(value):
+        return value.to_bytes(id_size, 'big')
+
+    def record(tag, body):
+        return struct.pack('>BII', tag, 0, len(body)) + body
+
+    def utf8(string_id, string):
+        return record(HPROF_UTF8, id_(string_id) + string.encode())
+
+    def load_class(serial, class_id, name_id):
+        return record(HPROF_LOAD_CLASS,
+                      struct.pack('>I', serial) + id_(class_id) + struct.pack('>I', 0) + id_(name_id))
+
+    class_dump = (
+        bytes([HPROF_GC_CLASS_DUMP]) + id_(FOO_CLASS_ID) + struct.pack('>I', 0)
+        + id_(0) * 6  # super class, loader, signers, domain, 2 reserved
+        + struct.pack('>I', 16)  # instance size
+        + struct.pack('>H', 1) + struct.pack('>HB', 0, HPROF_TYPE_INT) + struct.pack('>i', 42)
+        + struct.pack('>H', 1) + id_(3) + bytes([HPROF_TYPE_OBJECT]) + id_(0)
+        + struct.pack('>H', 2) + id_(4) + bytes([HPROF_TYPE_INT]) + id_(5) + bytes([HPROF_TYPE_OBJECT])
+    )
+    instances = b''.join(
+        bytes([HPROF_GC_INSTANCE_DUMP]) + id_(object_id) + struct.pack('>I', 0)
+        + id_(FOO_CLASS_ID) + struct.pack('>I', 16) + bytes(16)
+        for object_id in (0x1000, 0x1001)
+    )
+    object_array = (
+        bytes([HPROF_GC_OBJ_ARRAY_DUMP]) + id_(0x2000) + struct.pack('>II', 0, 3)
+        + id_(OBJECT_ARRAY_CLASS_ID) + id_(0x1000) * 3
+    )
+    int_array = (
+        bytes([HPROF_GC_PRIM_ARRAY_DUMP]) + id_(0x3000) + struct.pack('>II', 0, 2)
+        + bytes([HPROF_TYPE_INT]) + bytes(8)
+    )
+    root = bytes([HPROF_ROOT_STICKY_CLASS]) + id_(FOO_CLASS_ID)
+
+    return (
+        b'JAVA PROFILE 1.0.2\0' + struct.pack('>IQ', id_size, 1234567890)
+        + utf8(1, 'com/example/Foo')
+        + utf8(2, '[Ljava/lang/Object;')
+        + load_class(1, FOO_CLASS_ID, 1)
+        + load_class(2, OBJECT_ARRAY_CLASS_ID, 2)
+        + record(HPROF_HEAP_DUMP_SEGMENT, root + class_dump + instances + object_array + int_array)
+    )
+
+
+class GenerateHistogramTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def write(self, name, data):
+        path = Path(self.temp_dir.name) / name
+        path.write_bytes(gzip.compress(data) if name.endswith('.gz') else data)
+        return path
+
+    def test_counts_instances_and_arrays(self):
+        for id_size, name in ((8, 'dump.hprof'), (4, 'dump.hprof.gz')):
+            with self.subTest(id_size=id_size, name=name):
+                lines = generate_histogram(self.write(name, build_hprof(id_size))).splitlines()
+                rows = [line.split() for line in lines[2:-1]]
+                self.assertEqual(rows, [
+                    ['1:', '2', '32', 'com.example.Foo'],
+                    ['2:', '1', str(3 * id_size), '[Ljava.lang.Object;'],
+                    ['3:', '1', '8', '[I'],
+                ])
+                self.assertEqual(lines[-1].split(), ['Total', '4', str(40 + 3 * id_size)])
+
+    def test_rejects_non_hprof_input(self):
+        with self.assertRaisesRegex(ValueError, "Not an HPROF file"):
+            generate_histogram(self.write('text.hprof', b'x' * 10000))
+
+    def test_rejects_truncated_header(self):
+        with self.assertRaisesRegex(ValueError, "Truncated HPROF header"):
+            generate_histogram(self.write('short.hprof', build_hprof(8)[:25]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+/**
+ * Runs a test program and dumps the heap of its own JVM once the program
+ * reports that its heap scenario is set up, without attaching jmap or jcmd.
+ *
+ * Usage: DumpLauncher <main class> <output .hprof> [<max wait seconds>]
+ */
+import com.sun.management.HotSpotDiagnosticMXBean;
+
+import java.io.PrintStream;
+import java.lang.management.ManagementFactory;
+import java.lang.reflect.InvocationTargetException;
+import java.util.concurrent.CountDownLatch;
+import java.util.concurrent.TimeUnit;
+
+public class DumpLauncher {
+    /** Printed by every test program once its heap scenario is set up. */
+    private static final String READY_MARKER = "Press Ctrl+C to exit";
+
+    public static void main(String[] args) throws Exception {
+        if (args.length < 2) {
+            System.err.println("Usage: DumpLauncher <main class> <output .hprof> [<max wait seconds>]");
+            System.exit(2);
+        }
+        String mainClass = args[0];
+        String outputFile = args[1];
+        long maxWaitSecs = args.length > 2 ? Long.parseLong(args[2]) : 10;
+
+        CountDownLatch ready = new CountDownLatch(1);
+        System.setOut(new PrintStream(System.out, true) {
+            @Override
+            public void println(String line) {
+                super.println(line);
+                if (line != null && line.contains(READY_MARKER)) {
+                    ready.countDown();
+                }
+            }
+        });
+
+        Thread program = new Thread(() -> {
+            try {
+                Class.forName(mainClass)
+                        .getMethod("main", String[].class)
+                        .invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException e) {
+                e.getCause().printStackTrace();
+            } catch (ReflectiveOperationException e) {
+                e.printStackTrace();
+            }
+            ready.countDown();
+        }, mainClass);
+        program.setDaemon(true);
+        program.start();
+
+        if (!ready.await(maxWaitSecs, TimeUnit.SECONDS)) {
+            System.err.println("No ready marker after " + maxWaitSecs + "s, dumping anyway");
+        }
+        if (!program.isAlive()) {
+            System.err.println("Program " + mainClass + " exited prematurely");
+            System.exit(1);
+        }
+
+        ManagementFactory.getPlatformMXBean(HotSpotDiagnosticMXBean.class).dumpHeap(outputFile, true);
+        System.exit(0);
+    }
+}